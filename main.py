@@ -1,36 +1,148 @@
+import heapq
+import sys
+import time
+from array import array
+from collections import deque
 from datetime import datetime
-from abc import ABC, abstractmethod
+from itertools import islice
+from operator import attrgetter
+
+# Коды операций в истории undo/redo ветки
+ADD_COMMIT, JOIN_COMMITS = range(2)
+# Коды операций в истории undo/redo репозитория
+REMOVE_BRANCH, CLONE_BRANCH, ADD_BRANCH, CREATE_BRANCH = range(4)
+
+# Сколько последних операций хранится для undo/redo; более старые вытесняются и освобождают память
+UNDO_LIMIT = 1000
+
+
+def abstract(fn):
+    fn.__isabstractmethod__ = True
+    return fn
+
+
+class AbstractMeta(type):
+    '''
+    Облегченная замена ABCMeta: запрещает создавать экземпляры абстрактных классов,
+    но не переопределяет __instancecheck__, поэтому isinstance работает на быстром пути type.
+    '''
+    def __new__(mcls, name, bases, namespace, **kwargs):
+        cls = super().__new__(mcls, name, bases, namespace, **kwargs)
+        abstracts = {key for key, value in namespace.items() if getattr(value, '__isabstractmethod__', False)}
+        for base in bases:
+            for key in getattr(base, '__abstractmethods__', ()):
+                if getattr(getattr(cls, key, None), '__isabstractmethod__', False):
+                    abstracts.add(key)
+        cls.__abstractmethods__ = frozenset(abstracts)
+        return cls
+
+
+class OperationHistory:
+    '''
+    Общая история операций для undo/redo в виде кольцевого буфера: коды операций лежат в array,
+    их данные - в параллельном списке. _cursor - граница undo/redo в логических индексах от самой старой операции.
+    Подклассы задают _UNDO_TABLE и _REDO_TABLE - обработчики, индексируемые кодом операции.
+    '''
+    __slots__ = ('_op_codes', '_op_payloads', '_capacity', '_head', '_size', '_cursor')
+
+    _UNDO_TABLE = ()
+    _REDO_TABLE = ()
+
+    def __init__(self):
+        self._op_codes = array('b')
+        self._op_payloads = []
+        self._capacity = UNDO_LIMIT
+        self._head = 0  # Физический индекс самой старой операции
+        self._size = 0
+        self._cursor = 0
+
+    def _push(self, code: int, payload):
+        if self._capacity <= 0:
+            # UNDO_LIMIT = 0 отключает историю
+            return
+        op_payloads = self._op_payloads
+        slots_count = len(op_payloads)
+        # Новая операция отбрасывает все отмененные, которые еще можно было вернуть через redo
+        for i in range(self._cursor, self._size):
+            op_payloads[(self._head + i) % slots_count] = None
+        self._size = self._cursor
+        if self._size < slots_count:
+            slot = (self._head + self._size) % slots_count
+            self._op_codes[slot] = code
+            op_payloads[slot] = payload
+            self._size += 1
+        elif slots_count < self._capacity:
+            # Буфер еще не заполнен целиком, поэтому _head == 0 и новая операция просто дописывается в конец
+            self._op_codes.append(code)
+            op_payloads.append(payload)
+            self._size += 1
+        else:
+            # Самая старая операция вытесняется и освобождает память
+            slot = self._head
+            self._op_codes[slot] = code
+            op_payloads[slot] = payload
+            self._head = (slot + 1) % slots_count
+        self._cursor = self._size
+
+    def undo(self):
+        cursor = self._cursor - 1
+        if cursor >= 0:
+            slot = (self._head + cursor) % len(self._op_payloads)
+            self._UNDO_TABLE[self._op_codes[slot]](self, self._op_payloads[slot])
+            self._cursor = cursor
+
+    def redo(self):
+        cursor = self._cursor
+        if cursor < self._size:
+            slot = (self._head + cursor) % len(self._op_payloads)
+            self._REDO_TABLE[self._op_codes[slot]](self, self._op_payloads[slot])
+            self._cursor = cursor + 1
 
 
 class Commit:
+    __slots__ = ('name', 'description', '_ts_ns', '_created_at_str', 'files_list')
+
     def __init__(self, name: str, description: str, files_list: list[str]):
         self.name = name
         self.description = description
-        self.created_at = datetime.now()
-        self.files_list = files_list
+        self._ts_ns = time.time_ns()  # Время создания в наносекундах, datetime строится только по запросу
+        self._created_at_str = None  # Отформатированное время создания, заполняется при первом __str__
+        # Интернированные пути: одинаковые пути во всех коммитах ссылаются на один объект строки
+        self.files_list = frozenset(map(sys.intern, files_list))
+
+    def get_created_at(self) -> datetime:
+        return datetime.fromtimestamp(self._ts_ns / 1e9)
+
+    created_at = property(get_created_at)
 
+    # Внутри модуля поля коммита читаются напрямую; get_* оставлены только для внешнего кода
     def get_name(self) -> str:
         return self.name
 
     def get_description(self) -> str:
         return self.description
 
-    def get_created_at(self) -> datetime:
-        return self.created_at
-
-    def get_files_list(self) -> list[str]:
+    def get_files_list(self) -> frozenset[str]:
         return self.files_list
 
     def __str__(self):
-        return f"Commit: {self.name}, Description: {self.description}, Created at: {self.created_at}"
+        if self._created_at_str is None:
+            self._created_at_str = self.created_at.isoformat(' ')
+        return "Commit: %s, Description: %s, Created at: %s" % (self.name, self.description, self._created_at_str)
+
+
+class NotJoinableBranchesError(ValueError):
+    __slots__ = ()
+
 
+class Branch(metaclass=AbstractMeta):
+    __slots__ = ()
 
-class Branch(ABC):
-    @abstractmethod
-    def clone(self, last_commit: Commit = None) -> 'Branch':
+    @abstract
+    def clone(self, last_commit: Commit | int = None) -> 'Branch':
         pass
 
-    @abstractmethod
+    @abstract
     def __str__(self):
         '''
         Dunder-метод для строчного представления объекта. Выведите красиво историю коммитов в ветке.
@@ -38,11 +150,11 @@ class Branch(ABC):
         '''
         pass
 
-    @abstractmethod
+    @abstract
     def add_commit(self, name: str, description: str, file_list: list[str]):
         pass
 
-    @abstractmethod
+    @abstract
     def join(self, where_to_move_commits: 'Branch'):
         '''
         Производит слияние двух веток, если нет конфликтов (т.е. изменений одних и тех же файлов в разных коммитах)
@@ -51,7 +163,7 @@ class Branch(ABC):
         '''
         pass
 
-    @abstractmethod
+    @abstract
     def undo(self):
         '''
         Отменяет последние действия.
@@ -59,7 +171,7 @@ class Branch(ABC):
         '''
         pass
 
-    @abstractmethod
+    @abstract
     def redo(self):
         '''
         Откатывает отмененные действия.
@@ -68,62 +180,140 @@ class Branch(ABC):
         '''
         pass
 
-    @abstractmethod
+    @abstract
     def get_commits_list(self) -> list[Commit]:
         pass
 
-    @abstractmethod
+    @abstract
     def get_name(self) -> str:
         pass
 
 
-class ConcreteBranch(Branch):
+class ConcreteBranch(OperationHistory, Branch):
+    __slots__ = ('name', 'commits', 'positions', '_touched_files', '_str_cache')
+
     def __init__(self, name: str):
+        super().__init__()
         self.name = name
-        self.commits = []
-        self.undo_history = []  # История операций для undo
-        self.redo_history = []  # История операций для redo
+        self.commits = deque()
+        self.positions = {}  # id(коммита) -> его индекс в self.commits
+        self._touched_files = {}  # файл -> сколько коммитов ветки его изменяют
+        self._str_cache = None  # Строковое представление коммитов, сбрасывается при любом изменении
 
-    def clone(self, last_commit: Commit = None) -> Branch:
+    def clone(self, last_commit: Commit | int = None) -> Branch:
+        # last_commit можно передать и как объект коммита, и сразу как его индекс в ветке
         cloned_branch = ConcreteBranch(self.name)
-        if last_commit:
-            cloned_branch.commits = self.commits[:self.commits.index(last_commit) + 1]
+        if last_commit is not None:
+            if isinstance(last_commit, bool):
+                raise TypeError("last_commit must be a Commit or an int index, not bool")
+            if isinstance(last_commit, int):
+                idx = last_commit
+                if not 0 <= idx < len(self.commits):
+                    raise IndexError(f"Commit index {idx} is out of range for branch {self.name!r}")
+            else:
+                idx = self.positions.get(id(last_commit))
+                if idx is None:
+                    raise ValueError(f"Commit {last_commit.name!r} is not in branch {self.name!r}")
+            cloned_branch.commits = deque(islice(self.commits, idx + 1))
         else:
-            cloned_branch.commits = self.commits[:]
+            cloned_branch.commits = deque(self.commits)
+        cloned_branch._reindex()
         return cloned_branch
 
-    def __str__(self):
-        output = f"Branch: {self.name}\n"
+    def _reindex(self):
+        self.positions = {id(commit): idx for idx, commit in enumerate(self.commits)}
+        self._touched_files = {}
         for commit in self.commits:
-            output += str(commit) + "\n"
-        return output
+            self._touch(commit.files_list)
+
+    def _touch(self, files: frozenset[str]):
+        touched_files = self._touched_files
+        for file in files:
+            touched_files[file] = touched_files.get(file, 0) + 1
+
+    def _untouch(self, files: frozenset[str]):
+        touched_files = self._touched_files
+        for file in files:
+            count = touched_files[file] - 1
+            if count:
+                touched_files[file] = count
+            else:
+                del touched_files[file]
 
-    def add_commit(self, name: str, description: str, file_list: list[str]):
-        new_commit = Commit(name, description, file_list)
-        self.commits.append(new_commit)
-        self.undo_history.append(("add_commit", new_commit))  # Добавляем операцию в историю для undo
+    def __str__(self):
+        if self._str_cache is None:
+            lines = list(map(str, self.commits))
+            lines.append("")
+            self._str_cache = "\n".join(lines)
+        # Имя ветки в кэш не входит: репозиторий переименовывает ветки после clone
+        return f"Branch: {self.name}\n" + self._str_cache
 
-    def join(self, where_to_move_commits: Branch):
-        for commit in self.commits:
-            where_to_move_commits.add_commit(commit.name, commit.description, commit.file_list)
+    def add_commit(self, name: str, description: str, file_list: list[str]):
+        self._append_commit(Commit(name, description, file_list))
 
-    def undo(self):
-        if self.undo_history:
-            last_operation = self.undo_history.pop()
-            operation_name = last_operation[0]
-            if operation_name == "add_commit":
-                commit = last_operation[1]
-                self.commits.remove(commit)
-                self.redo_history.append(("add_commit", commit))  # Добавляем операцию в историю для redo
+    def _append_commit(self, commit: Commit):
+        # Добавляет уже существующий коммит, сохраняя его имя, описание и время создания
+        self.positions[id(commit)] = len(self.commits)
+        self.commits.append(commit)
+        self._touch(commit.files_list)
+        self._str_cache = None
+        self._push(ADD_COMMIT, commit)
 
-    def redo(self):
-        if self.redo_history:
-            last_operation = self.redo_history.pop()
-            operation_name = last_operation[0]
-            if operation_name == "add_commit":
-                commit = last_operation[1]
-                self.commits.append(commit)
-                self.undo_history.append(("add_commit", commit))  # Добавляем операцию в историю для undo
+    def join(self, where_to_move_commits: Branch):
+        # Проверки до любой работы со списками коммитов
+        if not isinstance(where_to_move_commits, ConcreteBranch):
+            raise TypeError(f"Cannot join into {type(where_to_move_commits).__name__}")
+        if where_to_move_commits is self:
+            raise NotJoinableBranchesError('self-merge')
+        # Коммиты, которые уже есть в целевой ветке (например, общая история после clone), не дублируются
+        target_positions = where_to_move_commits.positions
+        new_commits = [commit for commit in self.commits if id(commit) not in target_positions]
+        if not new_commits:
+            return
+        if len(new_commits) == len(self.commits):
+            # Общей истории нет: сравниваются все файлы обеих веток
+            conflicts = self._touched_files.keys() & where_to_move_commits._touched_files.keys()
+        else:
+            # Общие коммиты конфликтов не дают: сравниваются только коммиты, которых нет в другой ветке
+            source_positions = self.positions
+            target_only_files = frozenset().union(
+                *(commit.files_list for commit in where_to_move_commits.commits if id(commit) not in source_positions))
+            conflicts = frozenset().union(*(commit.files_list for commit in new_commits)) & target_only_files
+        if conflicts:
+            raise NotJoinableBranchesError(sorted(conflicts))
+        old_commits = where_to_move_commits.commits
+        merged_commits = deque(heapq.merge(old_commits, new_commits, key=attrgetter('_ts_ns')))
+        where_to_move_commits._set_commits(merged_commits)
+        where_to_move_commits._push(JOIN_COMMITS, (old_commits, merged_commits))
+
+    def _set_commits(self, commits: deque):
+        self.commits = commits
+        self._reindex()
+        self._str_cache = None
+
+    def _undo_add_commit(self, commit: Commit):
+        assert self.commits[-1] is commit
+        self.commits.pop()
+        del self.positions[id(commit)]
+        self._untouch(commit.files_list)
+        self._str_cache = None
+
+    def _redo_add_commit(self, commit: Commit):
+        self.positions[id(commit)] = len(self.commits)
+        self.commits.append(commit)
+        self._touch(commit.files_list)
+        self._str_cache = None
+
+    def _undo_join_commits(self, states: tuple):
+        old_commits, _ = states
+        self._set_commits(old_commits)
+
+    def _redo_join_commits(self, states: tuple):
+        _, merged_commits = states
+        self._set_commits(merged_commits)
+
+    _UNDO_TABLE = (_undo_add_commit, _undo_join_commits)
+    _REDO_TABLE = (_redo_add_commit, _redo_join_commits)
 
     def get_commits_list(self) -> list[Commit]:
         return self.commits
@@ -132,32 +322,34 @@ class ConcreteBranch(Branch):
         return self.name
 
 
-class Repository(ABC):
-    @abstractmethod
-    def create_branch(self, new_branch_name: str, base_branch_name: str = None, last_commit: Commit = None):
+class Repository(metaclass=AbstractMeta):
+    __slots__ = ()
+
+    @abstract
+    def create_branch(self, new_branch_name: str, base_branch_name: str = None, last_commit: Commit | int = None):
         pass
 
-    @abstractmethod
+    @abstract
     def remove_branch(self, name: str):
         pass
 
-    @abstractmethod
-    def clone_branch(self, name: str, new_name: str, last_commit: Commit = None):
+    @abstract
+    def clone_branch(self, name: str, new_name: str, last_commit: Commit | int = None):
         pass
 
-    @abstractmethod
+    @abstract
     def add_branch(self, new_branch: Branch):
         pass
 
-    @abstractmethod
+    @abstract
     def get_branch_list(self) -> list[Branch]:
         pass
 
-    @abstractmethod
+    @abstract
     def get_name(self) -> str:
         pass
 
-    @abstractmethod
+    @abstract
     def undo(self):
         '''
         Отменяет последние действия.
@@ -165,7 +357,7 @@ class Repository(ABC):
         '''
         pass
 
-    @abstractmethod
+    @abstract
     def redo(self):
         '''
         Откатывает отмененные действия.
@@ -175,41 +367,46 @@ class Repository(ABC):
         pass
 
 
-class ConcreteRepository(Repository):
+class ConcreteRepository(OperationHistory, Repository):
+    __slots__ = ('name', 'branches')
+
     def __init__(self, name: str):
+        super().__init__()
         self.name = name
         self.branches = {}
-        self.history = []
-        self.redo_history = []
 
-    def create_branch(self, new_branch_name: str, base_branch_name: str = None, last_commit: Commit = None):
+    def create_branch(self, new_branch_name: str, base_branch_name: str = None, last_commit: Commit | int = None):
+        new_branch_name = sys.intern(new_branch_name)
         if base_branch_name:
             base_branch = self.branches.get(base_branch_name)
             if base_branch:
                 cloned_branch = base_branch.clone(last_commit)
                 cloned_branch.name = new_branch_name
-                self.branches[new_branch_name] = cloned_branch
-                self.history.append(("create_branch", new_branch_name))
+                self._put_branch(CREATE_BRANCH, new_branch_name, cloned_branch)
         else:
-            new_branch = ConcreteBranch(new_branch_name)
-            self.branches[new_branch_name] = new_branch
-            self.history.append(("create_branch", new_branch_name))
+            self._put_branch(CREATE_BRANCH, new_branch_name, ConcreteBranch(new_branch_name))
 
     def remove_branch(self, name: str):
-        if name in self.branches:
-            del self.branches[name]
-            self.history.append(("remove_branch", name))
-
-    def clone_branch(self, name: str, new_name: str, last_commit: Commit = None):
-        if name in self.branches:
-            cloned_branch = self.branches[name].clone(last_commit)
+        branch = self.branches.pop(name, None)
+        if branch is not None:
+            self._push(REMOVE_BRANCH, (name, branch))
+
+    def clone_branch(self, name: str, new_name: str, last_commit: Commit | int = None):
+        base_branch = self.branches.get(name)
+        if base_branch is not None:
+            new_name = sys.intern(new_name)
+            cloned_branch = base_branch.clone(last_commit)
             cloned_branch.name = new_name
-            self.branches[new_name] = cloned_branch
-            self.history.append(("clone_branch", name, new_name))
+            self._put_branch(CLONE_BRANCH, new_name, cloned_branch)
 
     def add_branch(self, new_branch: Branch):
-        self.branches[new_branch.name] = new_branch
-        self.history.append(("add_branch", new_branch.name))
+        self._put_branch(ADD_BRANCH, sys.intern(new_branch.name), new_branch)
+
+    def _put_branch(self, code: int, name: str, branch: Branch):
+        # В историю попадают сами объекты веток (и вытесненная ветка с тем же именем), чтобы undo/redo их не пересоздавали
+        replaced_branch = self.branches.get(name)
+        self.branches[name] = branch
+        self._push(code, (name, branch, replaced_branch))
 
     def get_branch_list(self) -> list[Branch]:
         return list(self.branches.values())
@@ -217,36 +414,24 @@ class ConcreteRepository(Repository):
     def get_name(self) -> str:
         return self.name
 
-    def undo(self):
-        if self.history:
-            last_operation = self.history.pop()
-            operation_name = last_operation[0]
-            if operation_name == "remove_branch":
-                branch_name = last_operation[1]
-                del self.branches[branch_name]
-                self.redo_history.append(last_operation)
-            elif operation_name == "clone_branch":
-                _, cloned_branch_name, _ = last_operation
-
-                del self.branches[cloned_branch_name]
-                self.redo_history.append(last_operation)
-            elif operation_name == "add_branch":
-                branch_name = last_operation[1]
-                del self.branches[branch_name]
-                self.redo_history.append(last_operation)
+    def _undo_remove_branch(self, entry: tuple):
+        name, branch = entry
+        self.branches[name] = branch
 
-    def redo(self):
-        if self.redo_history:
-            last_operation = self.redo_history.pop()
-            operation_name = last_operation[0]
-            if operation_name == "remove_branch":
-                branch_name = last_operation[1]
-                del self.branches[branch_name]
-                self.history.append(last_operation)
-            elif operation_name == "clone_branch":
-                _, _, cloned_branch_name = last_operation
-                self.history.append(last_operation)
-            elif operation_name == "add_branch":
-                branch_name = last_operation[1]
-                self.branches[branch_name] = last_operation[2]
-                self.history.append(last_operation)
+    def _redo_remove_branch(self, entry: tuple):
+        name, _ = entry
+        self.branches.pop(name, None)
+
+    def _undo_put_branch(self, entry: tuple):
+        name, _, replaced_branch = entry
+        if replaced_branch is None:
+            self.branches.pop(name, None)
+        else:
+            self.branches[name] = replaced_branch
+
+    def _redo_put_branch(self, entry: tuple):
+        name, branch, _ = entry
+        self.branches[name] = branch
+
+    _UNDO_TABLE = (_undo_remove_branch, _undo_put_branch, _undo_put_branch, _undo_put_branch)
+    _REDO_TABLE = (_redo_remove_branch, _redo_put_branch, _redo_put_branch, _redo_put_branch)
@@ -0,0 +1,114 @@
+import unittest
+
+import main
+
+
+class OperationHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.undo_limit = main.UNDO_LIMIT
+
+    def tearDown(self):
+        main.UNDO_LIMIT = self.undo_limit
+
+    def make_branch(self, limit: int) -> main.ConcreteBranch:
+        main.UNDO_LIMIT = limit
+        return main.ConcreteBranch('test')
+
+    def names(self, branch: main.ConcreteBranch) -> list[str]:
+        return [commit.name for commit in branch.get_commits_list()]
+
+    def test_push_and_evict_oldest(self):
+        branch = self.make_branch(3)
+        for name in 'abcde':
+            branch.add_commit(name, '', [])
+        for _ in range(5):
+            branch.undo()
+        # Операции a и b вытеснены, отменить можно только c, d, e
+        self.assertEqual(self.names(branch), ['a', 'b'])
+        for _ in range(5):
+            branch.redo()
+        self.assertEqual(self.names(branch), ['a', 'b', 'c', 'd', 'e'])
+
+    def test_truncate_redo_across_wraparound(self):
+        branch = self.make_branch(3)
+        for name in 'abcd':
+            branch.add_commit(name, '', [])
+        branch.undo()
+        branch.undo()
+        branch.add_commit('x', '', [])
+        branch.redo()
+        self.assertEqual(self.names(branch), ['a', 'b', 'x'])
+        branch.add_commit('y', '', [])
+        branch.add_commit('z', '', [])
+        for _ in range(4):
+            branch.undo()
+        self.assertEqual(self.names(branch), ['a', 'b'])
+        for _ in range(4):
+            branch.redo()
+        self.assertEqual(self.names(branch), ['a', 'b', 'x', 'y', 'z'])
+
+    def test_truncated_redo_entries_are_released(self):
+        branch = self.make_branch(3)
+        for name in 'abcd':
+            branch.add_commit(name, '', [])
+        branch.undo()
+        branch.undo()
+        branch.add_commit('x', '', [])
+        live = [payload for payload in branch._op_payloads if payload is not None]
+        self.assertEqual(sorted(commit.name for commit in live), ['b', 'x'])
+
+    def test_zero_limit_disables_history(self):
+        branch = self.make_branch(0)
+        branch.add_commit('a', '', ['a.py'])
+        branch.undo()
+        branch.redo()
+        self.assertEqual(self.names(branch), ['a'])
+        repository = main.ConcreteRepository('repo')
+        repository.create_branch('main')
+        repository.undo()
+        self.assertEqual([b.get_name() for b in repository.get_branch_list()], ['main'])
+
+
+class CloneTest(unittest.TestCase):
+    def test_clone_at_foreign_commit_raises_value_error(self):
+        branch = main.ConcreteBranch('main')
+        branch.add_commit('A', '', [])
+        other = main.ConcreteBranch('other')
+        other.add_commit('B', '', [])
+        with self.assertRaisesRegex(ValueError, "Commit 'B' is not in branch 'main'"):
+            branch.clone(other.get_commits_list()[0])
+
+
+class JoinTest(unittest.TestCase):
+    def names(self, branch: main.ConcreteBranch) -> list[str]:
+        return [commit.name for commit in branch.get_commits_list()]
+
+    def test_clone_editing_shared_file_joins_back(self):
+        base = main.ConcreteBranch('base')
+        base.add_commit('A', '', ['main.py'])
+        cloned = base.clone()
+        cloned.add_commit('B', '', ['main.py'])
+        cloned.join(base)
+        self.assertEqual(self.names(base), ['A', 'B'])
+
+    def test_diverged_branches_editing_same_file_conflict(self):
+        base = main.ConcreteBranch('base')
+        base.add_commit('A', '', ['main.py'])
+        cloned = base.clone()
+        base.add_commit('B', '', ['main.py'])
+        cloned.add_commit('C', '', ['main.py'])
+        with self.assertRaises(main.NotJoinableBranchesError):
+            cloned.join(base)
+        self.assertEqual(self.names(base), ['A', 'B'])
+
+    def test_unrelated_branches_editing_same_file_conflict(self):
+        first = main.ConcreteBranch('first')
+        second = main.ConcreteBranch('second')
+        first.add_commit('A', '', ['main.py'])
+        second.add_commit('B', '', ['main.py'])
+        with self.assertRaises(main.NotJoinableBranchesError):
+            second.join(first)
+
+
+if __name__ == '__main__':
+    unittest.main()